@@ -5,12 +5,19 @@ Generates realistic trading intents for simulation and testing.
 """
 
 import argparse
-import json
+import bisect
+import heapq
+import itertools
+import multiprocessing
+import os
 import random
 import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
-import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Tuple
+
+import numpy as np
+import orjson
 
 # Token configuration
 TOKENS = {
@@ -57,93 +64,131 @@ USER_PROFILES = [
     },
 ]
 
+# Cumulative weights for single-intent selection
+_PAIR_CUM = list(itertools.accumulate(p[2] for p in TRADING_PAIRS))
+_PROFILE_CUM = list(itertools.accumulate(p["weight"] for p in USER_PROFILES))
+
+# Intents generated per time window when streaming
+WINDOW_SIZE = 10_000
+
+# Fill and routing options
+MIN_FILL_PERCENTS = [50, 75, 80, 90, 100]
+FILL_STRATEGIES = ["eager", "all_or_nothing", "price_based"]
+MAX_HOPS = [2, 3, 4]
+
+# Token, pair and profile fields as parallel tuples indexed by integer id
+TOKEN_NAMES = tuple(TOKENS)
+TOKEN_CHAINS = tuple(TOKENS[t]["chain"] for t in TOKEN_NAMES)
+TOKEN_PRICES = tuple(TOKENS[t]["price_usd"] for t in TOKEN_NAMES)
+_PAIR_TOKENS = tuple((TOKEN_NAMES.index(p[0]), TOKEN_NAMES.index(p[1])) for p in TRADING_PAIRS)
+_PROFILE_NAMES = tuple(p["name"] for p in USER_PROFILES)
+_PROFILE_AMOUNT_RANGES = tuple(p["amount_range"] for p in USER_PROFILES)
+_PROFILE_SLIPPAGE_RANGES = tuple(p["slippage_tolerance"] for p in USER_PROFILES)
+_PROFILE_TIMEOUTS = tuple(p["timeout"] for p in USER_PROFILES)
+
+# Constant chain_id/denom part of the input and output sub-dicts, copied per intent
+_TOKEN_SKELETONS = tuple({"chain_id": c, "denom": n} for n, c in zip(TOKEN_NAMES, TOKEN_CHAINS))
+
+# Column lookup tables for vectorized batch generation
+_TOKEN_PRICES = np.array(TOKEN_PRICES)
+_PAIR_INPUT = np.array([p[0] for p in _PAIR_TOKENS])
+_PAIR_OUTPUT = np.array([p[1] for p in _PAIR_TOKENS])
+_PAIR_WEIGHTS = np.array([p[2] for p in TRADING_PAIRS])
+_PAIR_WEIGHTS /= _PAIR_WEIGHTS.sum()
+_PROFILE_WEIGHTS = np.array([p["weight"] for p in USER_PROFILES])
+_PROFILE_WEIGHTS /= _PROFILE_WEIGHTS.sum()
+_PROFILE_AMOUNT = np.array(_PROFILE_AMOUNT_RANGES, dtype=np.float64)
+_PROFILE_SLIPPAGE = np.array(_PROFILE_SLIPPAGE_RANGES)
+_PROFILE_TIMEOUT = np.array(_PROFILE_TIMEOUTS, dtype=np.int64)
+
 
 def generate_address() -> str:
     """Generate a random Cosmos address."""
-    return f"cosmos1{''.join(random.choices('0123456789abcdef', k=38))}"
-
+    return f"cosmos1{os.urandom(19).hex()}"
 
-def select_trading_pair() -> tuple:
-    """Select a trading pair based on volume weights."""
-    weights = [p[2] for p in TRADING_PAIRS]
-    selected = random.choices(TRADING_PAIRS, weights=weights, k=1)[0]
-    return selected[0], selected[1]
 
+def _weighted_index(cum_weights: List[float]) -> int:
+    """Draw an index with probability proportional to its weight."""
+    return bisect.bisect(cum_weights, random.random() * cum_weights[-1])
 
-def select_user_profile() -> Dict:
-    """Select a user profile based on weights."""
-    weights = [p["weight"] for p in USER_PROFILES]
-    return random.choices(USER_PROFILES, weights=weights, k=1)[0]
 
-
-def generate_intent(
-    timestamp: datetime = None,
-    price_deviation: float = 0.0,
-) -> Dict[str, Any]:
-    """Generate a single trading intent."""
-    if timestamp is None:
-        timestamp = datetime.utcnow()
-
-    # Select trading pair and profile
-    input_denom, output_denom = select_trading_pair()
-    profile = select_user_profile()
-
-    # Calculate amounts
-    input_token = TOKENS[input_denom]
-    output_token = TOKENS[output_denom]
+def _build_intent_core(price_deviation: float = 0.0) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Build the API fields of an intent and the metadata describing its draw."""
+    # Select trading pair and profile by index
+    input_token, output_token = _PAIR_TOKENS[_weighted_index(_PAIR_CUM)]
+    profile = _weighted_index(_PROFILE_CUM)
 
     # Generate USD amount based on profile
-    usd_amount = random.uniform(*profile["amount_range"])
+    usd_amount = random.uniform(*_PROFILE_AMOUNT_RANGES[profile])
 
     # Apply price with deviation
-    input_price = input_token["price_usd"] * (1 + price_deviation * random.uniform(-1, 1))
-    output_price = output_token["price_usd"] * (1 + price_deviation * random.uniform(-1, 1))
+    input_price = TOKEN_PRICES[input_token] * (1 + price_deviation * random.uniform(-1, 1))
+    output_price = TOKEN_PRICES[output_token] * (1 + price_deviation * random.uniform(-1, 1))
 
     # Calculate token amounts (in micro units)
     input_amount = int((usd_amount / input_price) * 1_000_000)
     expected_output = int((usd_amount / output_price) * 1_000_000)
 
     # Apply slippage tolerance
-    slippage = random.uniform(*profile["slippage_tolerance"]) / 100
+    slippage = random.uniform(*_PROFILE_SLIPPAGE_RANGES[profile]) / 100
     min_output = int(expected_output * (1 - slippage))
 
     # Generate timeout
-    timeout_seconds = random.randint(*profile["timeout"])
+    timeout_seconds = random.randint(*_PROFILE_TIMEOUTS[profile])
 
-    return {
-        "id": f"intent_{uuid.uuid4()}",
+    input_dict = _TOKEN_SKELETONS[input_token].copy()
+    input_dict["amount"] = input_amount
+    output_dict = _TOKEN_SKELETONS[output_token].copy()
+    output_dict["min_amount"] = min_output
+
+    core = {
         "user_address": generate_address(),
-        "input": {
-            "chain_id": input_token["chain"],
-            "denom": input_denom,
-            "amount": input_amount,
-        },
-        "output": {
-            "chain_id": output_token["chain"],
-            "denom": output_denom,
-            "min_amount": min_output,
-        },
+        "input": input_dict,
+        "output": output_dict,
         "fill_config": {
             "allow_partial": random.random() > 0.3,
-            "min_fill_percent": random.choice([50, 75, 80, 90, 100]),
-            "strategy": random.choice(["eager", "all_or_nothing", "price_based"]),
+            "min_fill_percent": random.choice(MIN_FILL_PERCENTS),
+            "strategy": random.choice(FILL_STRATEGIES),
         },
         "constraints": {
-            "max_hops": random.choice([2, 3, 4]),
+            "max_hops": random.choice(MAX_HOPS),
             "allowed_venues": [],
             "excluded_venues": [],
             "max_slippage_bps": int(slippage * 10000),
         },
         "timeout_seconds": timeout_seconds,
+    }
+    metadata = {
+        "profile": _PROFILE_NAMES[profile],
+        "usd_value": round(usd_amount, 2),
+        "expected_output": expected_output,
+    }
+    return core, metadata
+
+
+def generate_intent(
+    timestamp: datetime = None,
+    price_deviation: float = 0.0,
+) -> Dict[str, Any]:
+    """Generate a single trading intent."""
+    if timestamp is None:
+        timestamp = datetime.utcnow()
+
+    core, metadata = _build_intent_core(price_deviation)
+    return {
+        "id": f"intent_{os.urandom(16).hex()}",
+        **core,
         "created_at": timestamp.isoformat() + "Z",
-        "metadata": {
-            "profile": profile["name"],
-            "usd_value": round(usd_amount, 2),
-            "expected_output": expected_output,
-        },
+        "metadata": metadata,
     }
 
 
+def generate_intent_for_wire(price_deviation: float = 0.0) -> Dict[str, Any]:
+    """Generate a single intent with only the fields the API accepts."""
+    core, _ = _build_intent_core(price_deviation)
+    return core
+
+
 def generate_matching_pair() -> tuple:
     """Generate two opposing intents that can be matched."""
     timestamp = datetime.utcnow()
@@ -165,36 +210,305 @@ def generate_matching_pair() -> tuple:
     return intent1, intent2
 
 
+def _sample_columns(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """Draw every random field for n intents at once, one array per field."""
+    pair = rng.choice(len(TRADING_PAIRS), size=n, p=_PAIR_WEIGHTS)
+    profile = rng.choice(len(USER_PROFILES), size=n, p=_PROFILE_WEIGHTS)
+    input_token = _PAIR_INPUT[pair]
+    output_token = _PAIR_OUTPUT[pair]
+
+    # Generate USD amount based on profile
+    usd_amount = rng.uniform(_PROFILE_AMOUNT[profile, 0], _PROFILE_AMOUNT[profile, 1])
+
+    # Token prices; row 0 is the input side, row 1 the output
+    prices = _TOKEN_PRICES[np.stack([input_token, output_token])]
+
+    # Calculate both token amounts (in micro units) in one pass
+    input_amount, expected_output = (usd_amount / prices * 1_000_000).astype(np.int64)
+
+    # Apply slippage tolerance
+    slippage = rng.uniform(_PROFILE_SLIPPAGE[profile, 0], _PROFILE_SLIPPAGE[profile, 1]) / 100
+    min_output = (expected_output * (1 - slippage)).astype(np.int64)
+
+    return {
+        "input_token": input_token,
+        "output_token": output_token,
+        "input_amount": input_amount,
+        "min_output": min_output,
+        "allow_partial": rng.random(n) > 0.3,
+        "min_fill_percent": rng.choice(MIN_FILL_PERCENTS, size=n),
+        "strategy": rng.integers(len(FILL_STRATEGIES), size=n),
+        "max_hops": rng.choice(MAX_HOPS, size=n),
+        "max_slippage_bps": (slippage * 10000).astype(np.int64),
+        "timeout_seconds": rng.integers(
+            _PROFILE_TIMEOUT[profile, 0], _PROFILE_TIMEOUT[profile, 1], endpoint=True
+        ),
+        "profile": profile,
+        "usd_value": np.round(usd_amount, 2),
+        "expected_output": expected_output,
+    }
+
+
+def _assemble_intents(columns: Dict[str, np.ndarray], timestamps: List[str]) -> List[Dict]:
+    """Zip sampled columns into intent dicts."""
+    # One urandom draw and hex encoding for the whole batch, sliced per intent
+    n = len(timestamps)
+    uuid_hex = os.urandom(16 * n).hex()
+    address_hex = os.urandom(19 * n).hex()
+    return [
+        {
+            "id": f"intent_{uuid_hex[32 * i:32 * (i + 1)]}",
+            "user_address": f"cosmos1{address_hex[38 * i:38 * (i + 1)]}",
+            "input": {
+                "chain_id": TOKEN_CHAINS[input_token],
+                "denom": TOKEN_NAMES[input_token],
+                "amount": input_amount,
+            },
+            "output": {
+                "chain_id": TOKEN_CHAINS[output_token],
+                "denom": TOKEN_NAMES[output_token],
+                "min_amount": min_output,
+            },
+            "fill_config": {
+                "allow_partial": allow_partial,
+                "min_fill_percent": min_fill_percent,
+                "strategy": FILL_STRATEGIES[strategy],
+            },
+            "constraints": {
+                "max_hops": max_hops,
+                "allowed_venues": [],
+                "excluded_venues": [],
+                "max_slippage_bps": max_slippage_bps,
+            },
+            "timeout_seconds": timeout_seconds,
+            "created_at": created_at,
+            "metadata": {
+                "profile": _PROFILE_NAMES[profile],
+                "usd_value": usd_value,
+                "expected_output": expected_output,
+            },
+        }
+        for (
+            input_token, output_token, input_amount, min_output,
+            allow_partial, min_fill_percent, strategy, max_hops, max_slippage_bps,
+            timeout_seconds, profile, usd_value, expected_output, created_at, i,
+        ) in zip(
+            *(columns[k].tolist() for k in (
+                "input_token", "output_token", "input_amount", "min_output",
+                "allow_partial", "min_fill_percent", "strategy", "max_hops", "max_slippage_bps",
+                "timeout_seconds", "profile", "usd_value", "expected_output",
+            )),
+            timestamps,
+            range(n),
+        )
+    ]
+
+
+def _generate_window(
+    rng: np.random.Generator,
+    iso: Callable[[int], str],
+    window_start: float,
+    window_end: float,
+    matching_count: int,
+    random_count: int,
+) -> Tuple[np.ndarray, List[Dict]]:
+    """Generate the intents of one time window, ordered by offset."""
+    # Generate matching pairs: the second side swaps denoms and mirrors amounts
+    first = _sample_columns(rng, matching_count)
+    second = _sample_columns(rng, matching_count)
+    second["input_token"] = first["output_token"]
+    second["output_token"] = first["input_token"]
+    second["input_amount"] = (
+        first["min_output"] * rng.uniform(0.9, 1.1, matching_count)
+    ).astype(np.int64)
+    second["min_output"] = (
+        first["input_amount"] * rng.uniform(0.85, 0.95, matching_count)
+    ).astype(np.int64)
+    pair_offsets = rng.uniform(window_start, window_end, matching_count)
+    second_offsets = pair_offsets + rng.uniform(0, 5, matching_count)
+
+    # Generate remaining random intents
+    rest = _sample_columns(rng, random_count)
+    rest_offsets = rng.uniform(window_start, window_end, random_count)
+
+    # Order by offset numerically, then format each timestamp once at emit
+    offsets = np.concatenate([pair_offsets, second_offsets, rest_offsets])
+    order = np.argsort(offsets, kind="stable")
+    offsets = offsets[order]
+    columns = {
+        k: np.concatenate([first[k], second[k], rest[k]])[order]
+        for k in first
+    }
+    timestamps = [iso(b) for b in (offsets * 100).astype(np.int64).tolist()]
+
+    return offsets, _assemble_intents(columns, timestamps)
+
+
+def _iso_formatter(start_time: datetime) -> Callable[[int], str]:
+    """Return a function formatting 10ms offset buckets as created_at strings.
+
+    Each bucket is formatted only once; a 60s span has at most 6000 of them.
+    """
+    cache: Dict[int, str] = {}
+
+    def iso(bucket: int) -> str:
+        timestamp = cache.get(bucket)
+        if timestamp is None:
+            timestamp = (start_time + timedelta(milliseconds=10 * bucket)).isoformat(
+                timespec="microseconds"
+            ) + "Z"
+            cache[bucket] = timestamp
+        return timestamp
+
+    return iso
+
+
+def _plan_windows(
+    rng: np.random.Generator,
+    count: int,
+    matching_ratio: float,
+    time_span_seconds: int,
+) -> List[Tuple[float, float, int, int]]:
+    """Split the time span into windows of about WINDOW_SIZE intents.
+
+    Returns (window_start, window_end, matching_pairs, random_intents) per window.
+    """
+    matching_count = int(count * matching_ratio / 2)
+    remaining = count - 2 * matching_count
+    windows = max(1, -(-count // WINDOW_SIZE))
+    width = time_span_seconds / windows
+
+    # Multinomial split matches drawing every offset uniformly over the span
+    shares = [1 / windows] * windows
+    window_pairs = rng.multinomial(matching_count, shares).tolist()
+    window_randoms = rng.multinomial(remaining, shares).tolist()
+
+    return [
+        (w * width, (w + 1) * width, window_pairs[w], window_randoms[w])
+        for w in range(windows)
+    ]
+
+
+def _merge_windows(windows: Iterable[Tuple[float, np.ndarray, List[Any]]]) -> Iterator[Any]:
+    """Merge per-window output, each sorted by offset, into one ordered stream.
+
+    Matching counterparts can land past their window's end; they wait in a
+    min-heap until no later window can produce an earlier item.
+    """
+    carry: List[Tuple[float, int, Any]] = []
+    seq = itertools.count()
+    for window_end, offsets, items in windows:
+        split = int(np.searchsorted(offsets, window_end))
+        for offset, item in zip(offsets[split:].tolist(), items[split:]):
+            heapq.heappush(carry, (offset, next(seq), item))
+
+        ready_offsets = []
+        ready_items = []
+        while carry and carry[0][0] < window_end:
+            offset, _, item = heapq.heappop(carry)
+            ready_offsets.append(offset)
+            ready_items.append(item)
+
+        if not ready_items:
+            yield from items[:split]
+            continue
+
+        # Both runs are sorted; a stable argsort of just the emitted part merges them
+        merged = ready_items + items[:split]
+        order = np.argsort(np.concatenate([ready_offsets, offsets[:split]]), kind="stable")
+        yield from (merged[i] for i in order.tolist())
+
+    while carry:
+        yield heapq.heappop(carry)[2]
+
+
+def _encode_window(
+    job: Tuple[datetime, Tuple[float, float, int, int], int],
+) -> Tuple[float, np.ndarray, List[Tuple[bytes, float, str]]]:
+    """Generate and serialize one window; runs in a worker process.
+
+    Returns (line, usd_value, profile) per intent so the parent only has to
+    merge and write bytes.
+    """
+    start_time, window, option = job
+    offsets, intents = _generate_window(
+        np.random.default_rng(), _iso_formatter(start_time), *window
+    )
+    records = [
+        (
+            orjson.dumps(intent, option=option),
+            intent["metadata"]["usd_value"],
+            intent["metadata"]["profile"],
+        )
+        for intent in intents
+    ]
+    return window[1], offsets, records
+
+
+def _imap_bounded(pool, func: Callable, jobs: Iterable, prefetch: int) -> Iterator:
+    """Like pool.imap, but with at most prefetch jobs queued or unread."""
+    pending = deque()
+    for job in jobs:
+        pending.append(pool.apply_async(func, (job,)))
+        if len(pending) >= prefetch:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def iter_intents(
+    count: int,
+    matching_ratio: float = 0.3,
+    time_span_seconds: int = 60,
+) -> Iterator[Dict]:
+    """Yield intents with optional matching pairs in timestamp order.
+
+    The time span is split into windows of about WINDOW_SIZE intents that are
+    generated one at a time. When the span is much longer than the 5s matching
+    counterpart jitter, memory stays bounded for any count; for shorter spans
+    most counterparts are held until the end of the run.
+    """
+    rng = np.random.default_rng()
+    iso = _iso_formatter(datetime.utcnow())
+    windows = (
+        (window[1], *_generate_window(rng, iso, *window))
+        for window in _plan_windows(rng, count, matching_ratio, time_span_seconds)
+    )
+    yield from _merge_windows(windows)
+
+
 def generate_batch(
     count: int,
     matching_ratio: float = 0.3,
     time_span_seconds: int = 60,
 ) -> List[Dict]:
     """Generate a batch of intents with optional matching pairs."""
-    intents = []
-    start_time = datetime.utcnow()
+    return list(iter_intents(count, matching_ratio, time_span_seconds))
 
-    # Generate matching pairs
-    matching_count = int(count * matching_ratio / 2)
-    for _ in range(matching_count):
-        offset = random.uniform(0, time_span_seconds)
-        timestamp = start_time + timedelta(seconds=offset)
-        intent1, intent2 = generate_matching_pair()
-        intent1["created_at"] = timestamp.isoformat() + "Z"
-        intent2["created_at"] = (timestamp + timedelta(seconds=random.uniform(0, 5))).isoformat() + "Z"
-        intents.extend([intent1, intent2])
 
-    # Generate remaining random intents
-    remaining = count - len(intents)
-    for _ in range(remaining):
-        offset = random.uniform(0, time_span_seconds)
-        timestamp = start_time + timedelta(seconds=offset)
-        intents.append(generate_intent(timestamp))
+def iter_encoded_intents(
+    count: int,
+    matching_ratio: float = 0.3,
+    time_span_seconds: int = 60,
+    option: int = 0,
+    processes: int = 1,
+) -> Iterator[Tuple[bytes, float, str]]:
+    """Yield (orjson line, usd_value, profile) per intent in timestamp order.
+
+    With processes > 1, windows are generated and serialized in a process
+    pool; only a few windows per process are in flight at once.
+    """
+    start_time = datetime.utcnow()
+    plan = _plan_windows(np.random.default_rng(), count, matching_ratio, time_span_seconds)
+    jobs = ((start_time, window, option) for window in plan)
 
-    # Sort by timestamp
-    intents.sort(key=lambda x: x["created_at"])
+    processes = min(processes, len(plan))
+    if processes <= 1:
+        yield from _merge_windows(map(_encode_window, jobs))
+        return
 
-    return intents
+    with multiprocessing.Pool(processes) as pool:
+        yield from _merge_windows(_imap_bounded(pool, _encode_window, jobs, 2 * processes))
 
 
 def main():
@@ -207,34 +521,46 @@ def main():
     parser.add_argument("--output", type=str, default="intents.json",
                         help="Output file path")
     parser.add_argument("--pretty", action="store_true", help="Pretty print JSON output")
+    parser.add_argument("--jsonl", action="store_true",
+                        help="Write one intent per line instead of a JSON array")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for generation (1 to disable)")
 
     args = parser.parse_args()
 
     print(f"Generating {args.count} intents...")
-    intents = generate_batch(
-        count=args.count,
-        matching_ratio=args.matching_ratio,
-        time_span_seconds=args.time_span,
-    )
 
-    # Calculate statistics
-    total_volume = sum(i["metadata"]["usd_value"] for i in intents)
+    # Stream intents to disk as they are generated, tracking statistics
+    option = orjson.OPT_INDENT_2 if args.pretty and not args.jsonl else 0
+    generated = 0
+    total_volume = 0.0
     profile_counts = {}
-    for intent in intents:
-        profile = intent["metadata"]["profile"]
-        profile_counts[profile] = profile_counts.get(profile, 0) + 1
-
-    print(f"Generated {len(intents)} intents")
+    with open(args.output, "wb", buffering=1 << 20) as f:
+        if not args.jsonl:
+            f.write(b"[")
+        for line, usd_value, profile in iter_encoded_intents(
+            count=args.count,
+            matching_ratio=args.matching_ratio,
+            time_span_seconds=args.time_span,
+            option=option,
+            processes=args.processes,
+        ):
+            total_volume += usd_value
+            profile_counts[profile] = profile_counts.get(profile, 0) + 1
+
+            if args.jsonl:
+                f.write(line)
+                f.write(b"\n")
+            else:
+                f.write(b",\n" if generated else b"\n")
+                f.write(line)
+            generated += 1
+        if not args.jsonl:
+            f.write(b"\n]\n")
+
+    print(f"Generated {generated} intents")
     print(f"Total volume: ${total_volume:,.2f}")
     print(f"Profile distribution: {profile_counts}")
-
-    # Write output
-    with open(args.output, "w") as f:
-        if args.pretty:
-            json.dump(intents, f, indent=2)
-        else:
-            json.dump(intents, f)
-
     print(f"Written to {args.output}")
 
 
@@ -6,24 +6,31 @@ Stress test the Skip Select Simulator with configurable load patterns.
 
 import argparse
 import asyncio
-import json
+import itertools
 import time
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, NamedTuple
 import aiohttp
-import statistics
+import orjson
+from hdrh.histogram import HdrHistogram
 
-from intent_generator import generate_intent
+from intent_generator import generate_intent_for_wire
 
+# Number of distinct pre-serialized intents cycled through by the workers
+PAYLOAD_POOL_SIZE = 1024
 
-@dataclass
-class TestResult:
+
+def build_payload_pool(size: int = PAYLOAD_POOL_SIZE) -> List[bytes]:
+    """Pre-serialize API request bodies so workers do no per-request generation."""
+    return [orjson.dumps(generate_intent_for_wire()) for _ in range(size)]
+
+
+class TestResult(NamedTuple):
     """Result of a single request."""
     success: bool
     latency_ms: float
     status_code: int = 0
     error: str = ""
-    timestamp: float = field(default_factory=time.time)
 
 
 @dataclass
@@ -32,10 +39,34 @@ class TestStats:
     total_requests: int = 0
     successful_requests: int = 0
     failed_requests: int = 0
-    latencies: List[float] = field(default_factory=list)
+    # Latencies in microseconds, 1us to 60s at 3 significant figures
+    latency_histogram: HdrHistogram = field(
+        default_factory=lambda: HdrHistogram(1, 60_000_000, 3)
+    )
+    total_latency_ms: float = 0
     errors: Dict[str, int] = field(default_factory=dict)
     start_time: float = 0
     end_time: float = 0
+    _percentiles: Dict[float, int] = field(default_factory=dict, init=False, repr=False)
+    _percentiles_count: int = field(default=0, init=False, repr=False)
+
+    def record(self, result: TestResult):
+        """Fold a single request result into the statistics."""
+        self.total_requests += 1
+        self.total_latency_ms += result.latency_ms
+        # Values above the histogram's range would be dropped; clamp so the
+        # histogram and the running total count the same requests
+        self.latency_histogram.record_value(min(
+            int(result.latency_ms * 1000),
+            self.latency_histogram.highest_trackable_value,
+        ))
+
+        if result.success:
+            self.successful_requests += 1
+        else:
+            self.failed_requests += 1
+            error_key = result.error or f"HTTP {result.status_code}"
+            self.errors[error_key] = self.errors.get(error_key, 0) + 1
 
     @property
     def success_rate(self) -> float:
@@ -43,33 +74,48 @@ class TestStats:
             return 0
         return self.successful_requests / self.total_requests * 100
 
+    def _latency_percentile(self, percentile: float) -> float:
+        """P50/P95/P99 from one histogram pass, cached until more results arrive."""
+        if self._percentiles_count != self.total_requests:
+            self._percentiles = self.latency_histogram.get_percentile_to_value_dict([50, 95, 99])
+            self._percentiles_count = self.total_requests
+        return self._percentiles[percentile] / 1000
+
     @property
     def avg_latency(self) -> float:
-        if not self.latencies:
+        if self.total_requests == 0:
             return 0
-        return statistics.mean(self.latencies)
+        return self.total_latency_ms / self.total_requests
 
     @property
     def p50_latency(self) -> float:
-        if not self.latencies:
+        if self.total_requests == 0:
             return 0
-        return statistics.median(self.latencies)
+        return self._latency_percentile(50)
 
     @property
     def p95_latency(self) -> float:
-        if not self.latencies:
+        if self.total_requests == 0:
             return 0
-        sorted_latencies = sorted(self.latencies)
-        idx = int(len(sorted_latencies) * 0.95)
-        return sorted_latencies[idx]
+        return self._latency_percentile(95)
 
     @property
     def p99_latency(self) -> float:
-        if not self.latencies:
+        if self.total_requests == 0:
             return 0
-        sorted_latencies = sorted(self.latencies)
-        idx = int(len(sorted_latencies) * 0.99)
-        return sorted_latencies[min(idx, len(sorted_latencies) - 1)]
+        return self._latency_percentile(99)
+
+    @property
+    def min_latency(self) -> float:
+        if self.total_requests == 0:
+            return 0
+        return self.latency_histogram.get_min_value() / 1000
+
+    @property
+    def max_latency(self) -> float:
+        if self.total_requests == 0:
+            return 0
+        return self.latency_histogram.get_max_value() / 1000
 
     @property
     def requests_per_second(self) -> float:
@@ -94,8 +140,8 @@ Latency (ms):
   P50: {self.p50_latency:.2f}
   P95: {self.p95_latency:.2f}
   P99: {self.p99_latency:.2f}
-  Min: {min(self.latencies) if self.latencies else 0:.2f}
-  Max: {max(self.latencies) if self.latencies else 0:.2f}
+  Min: {self.min_latency:.2f}
+  Max: {self.max_latency:.2f}
 
 Errors:
 {self._format_errors()}
@@ -122,70 +168,82 @@ class LoadTester:
         self.duration = duration_seconds
         self.concurrent_limit = concurrent_limit
         self.stats = TestStats()
-        self._semaphore = asyncio.Semaphore(concurrent_limit)
 
     async def _make_request(
         self,
         session: aiohttp.ClientSession,
-        intent: Dict[str, Any],
+        payload: bytes,
     ) -> TestResult:
         """Make a single API request."""
-        start = time.time()
+        start = time.perf_counter_ns()
         try:
-            async with self._semaphore:
-                async with session.post(
-                    f"{self.target_url}/api/v1/intents",
-                    json=intent,
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response:
-                    latency = (time.time() - start) * 1000
-                    await response.text()
-
-                    return TestResult(
-                        success=response.status == 200,
-                        latency_ms=latency,
-                        status_code=response.status,
-                    )
+            async with session.post(
+                f"{self.target_url}/api/v1/intents",
+                data=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=aiohttp.ClientTimeout(total=30),
+            ) as response:
+                latency = (time.perf_counter_ns() - start) / 1e6
+                # Drain the body without decoding so the connection can be reused
+                await response.read()
+
+                return TestResult(
+                    success=response.status == 200,
+                    latency_ms=latency,
+                    status_code=response.status,
+                )
         except asyncio.TimeoutError:
             return TestResult(
                 success=False,
-                latency_ms=(time.time() - start) * 1000,
+                latency_ms=(time.perf_counter_ns() - start) / 1e6,
                 error="timeout",
             )
         except aiohttp.ClientError as e:
             return TestResult(
                 success=False,
-                latency_ms=(time.time() - start) * 1000,
+                latency_ms=(time.perf_counter_ns() - start) / 1e6,
                 error=str(type(e).__name__),
             )
         except Exception as e:
             return TestResult(
                 success=False,
-                latency_ms=(time.time() - start) * 1000,
+                latency_ms=(time.perf_counter_ns() - start) / 1e6,
                 error=str(e),
             )
 
     async def _worker(
         self,
         session: aiohttp.ClientSession,
-        results: List[TestResult],
+        payloads: Iterator[bytes],
     ):
-        """Worker that sends requests at the configured rate."""
+        """Worker that sends requests at the configured rate.
+
+        Sends are scheduled against absolute deadlines and each request runs as
+        its own task, so response latency does not slow down the send rate.
+        """
+        loop = asyncio.get_running_loop()
         interval = 1.0 / self.rps
-        end_time = time.time() + self.duration
+        next_send = loop.time()
+        end_time = next_send + self.duration
+        inflight = set()
+
+        def on_done(task: asyncio.Task):
+            inflight.discard(task)
+            if not task.cancelled():
+                self.stats.record(task.result())
 
-        while time.time() < end_time:
-            intent = generate_intent()
-            # Remove metadata that's not part of the API
-            del intent["id"]
-            del intent["metadata"]
-            del intent["created_at"]
+        while next_send < end_time:
+            now = loop.time()
+            if next_send > now:
+                await asyncio.sleep(next_send - now)
+            next_send += interval
 
-            result = await self._make_request(session, intent)
-            results.append(result)
+            task = asyncio.create_task(self._make_request(session, next(payloads)))
+            inflight.add(task)
+            task.add_done_callback(on_done)
 
-            # Sleep to maintain RPS
-            await asyncio.sleep(interval)
+        if inflight:
+            await asyncio.wait(inflight)
 
     async def run(self) -> TestStats:
         """Run the load test."""
@@ -194,12 +252,21 @@ class LoadTester:
         print(f"Concurrent limit: {self.concurrent_limit}")
         print()
 
-        results: List[TestResult] = []
+        # Shared across workers so each draws the next payload in the pool
+        payloads = itertools.cycle(build_payload_pool())
+
         self.stats = TestStats()
         self.stats.start_time = time.time()
 
-        # Create worker tasks
-        connector = aiohttp.TCPConnector(limit=self.concurrent_limit)
+        # Create worker tasks; the connector's socket limit bounds concurrent requests
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrent_limit,
+            limit_per_host=self.concurrent_limit,
+            use_dns_cache=True,
+            ttl_dns_cache=600,
+            keepalive_timeout=75,
+            enable_cleanup_closed=True,
+        )
         async with aiohttp.ClientSession(connector=connector) as session:
             # Use multiple workers to achieve higher RPS
             num_workers = min(int(self.rps / 10) + 1, 50)
@@ -210,7 +277,7 @@ class LoadTester:
             self.rps = worker_rps
 
             tasks = [
-                asyncio.create_task(self._worker(session, results))
+                asyncio.create_task(self._worker(session, payloads))
                 for _ in range(num_workers)
             ]
 
@@ -218,7 +285,7 @@ class LoadTester:
             async def report_progress():
                 while True:
                     await asyncio.sleep(5)
-                    print(f"Progress: {len(results)} requests sent...")
+                    print(f"Progress: {self.stats.total_requests} requests sent...")
 
             progress_task = asyncio.create_task(report_progress())
 
@@ -235,18 +302,6 @@ class LoadTester:
 
         self.stats.end_time = time.time()
 
-        # Aggregate results
-        for result in results:
-            self.stats.total_requests += 1
-            self.stats.latencies.append(result.latency_ms)
-
-            if result.success:
-                self.stats.successful_requests += 1
-            else:
-                self.stats.failed_requests += 1
-                error_key = result.error or f"HTTP {result.status_code}"
-                self.stats.errors[error_key] = self.stats.errors.get(error_key, 0) + 1
-
         return self.stats
 
 
@@ -262,8 +317,8 @@ async def main_async(args):
     print(stats.summary())
 
     if args.output:
-        with open(args.output, "w") as f:
-            json.dump({
+        with open(args.output, "wb") as f:
+            f.write(orjson.dumps({
                 "config": {
                     "target": args.target,
                     "rps": args.rps,
@@ -282,7 +337,7 @@ async def main_async(args):
                     "latency_p99_ms": stats.p99_latency,
                     "errors": stats.errors,
                 },
-            }, f, indent=2)
+            }, option=orjson.OPT_INDENT_2))
         print(f"Results written to {args.output}")
 
 